@@ -1,28 +1,243 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for, make_response
+from flask import Flask, Response, g, request, jsonify, render_template, stream_template, redirect, url_for
 from flask_cors import CORS
+from pydantic import BaseModel, ValidationError
+from typing import Literal
 import sqlite3
+import threading
+import queue
+import atexit
+import time
 import datetime
 import uuid
-from fraud_model import get_risk_score, initialize_or_load_model
+from fraud_model import get_risk_score, initialize_or_load_model, start_scoring_pool
 
 app = Flask(__name__)
 CORS(app) 
 
 RISK_THRESHOLD_DENY = 0.8  # Deny if risk is very high
 RISK_THRESHOLD_FLAG = 0.4  # Flag for review if risk is medium
+_RISK_STATUS = ("Approved", "Flagged", "Denied")  # Indexed by thresholds crossed
 SIMULATION_ACCOUNT = "0000000000000000" # Special account for infinite funds
+SCORING_WORKERS = 4  # Model scoring processes, leaving request threads free for I/O
+PORTAL_PAGE_SIZE = 50  # Default flagged transactions / accounts per banker portal page
+PORTAL_MAX_PAGE_SIZE = 200
+PORTAL_MAX_PAGE = 1_000_000  # Keeps (page - 1) * page_size far inside SQLite's 64-bit OFFSET
+
+# Rows are plain tuples; these fix the selected column order and give the
+# banker portal template index constants (e.g. txn[TXN.risk_score]).
+TXN_COLUMNS = ('id', 'account_number', 'amount', 'payment_method', 'ts_ms', 'status', 'risk_score', 'is_fraud')
+ACCOUNT_COLUMNS = ('account_number', 'customer_name', 'current_balance')
+TXN = {name: index for index, name in enumerate(TXN_COLUMNS)}
+ACCOUNT = {name: index for index, name in enumerate(ACCOUNT_COLUMNS)}
+_TXN_IS_TOP = len(TXN_COLUMNS)  # Index of the tag column appended by the portal query
+
+DATABASE_PATH = 'vmb_gateway.db'
+DB_CACHED_STATEMENTS = 256  # Per-connection prepared statement cache size
+DB_POOL_SIZE = 8  # Connections shared by all request threads
+DB_POOL_TIMEOUT = 5.0  # Seconds a request waits for a free connection before a 503
+
+# Hot-path statements, kept as constants so every request reuses the same
+# string object and hits the connection's prepared statement cache.
+# Creates unknown accounts with the simulated opening balance; returns the balance either way.
+_SQL_UPSERT_ACCOUNT = '''INSERT INTO accounts (account_number, current_balance, customer_name) 
+                         VALUES (?, ?, ?)
+                         ON CONFLICT(account_number) DO UPDATE SET account_number = excluded.account_number
+                         RETURNING current_balance'''
+_SQL_UPDATE_BAL = 'UPDATE accounts SET current_balance = ? WHERE account_number = ?'
+_SQL_INSERT_TXN = '''INSERT INTO transactions 
+                     (account_number, amount, payment_method, ts_ms, status, risk_score, is_fraud) 
+                     VALUES (?, ?, ?, ?, ?, ?, ?)'''
+
+_db_pool = queue.LifoQueue()  # Idle connections; LIFO keeps the warmest ones in use
+_db_pool_lock = threading.Lock()
+_db_pool_opened = 0
+
+
+class PaymentIn(BaseModel):
+    """Validated /api/process_payment request body."""
+    account_number: str
+    amount: float
+    security_pin: str
+    payment_method: Literal['vmb_transfer', 'card_payment', 'crypto', 'digital_wallet']
+
+def _validation_message(error):
+    if error['type'] == 'missing':
+        return "Missing required transaction data."
+    field = error['loc'][0] if error['loc'] else 'request'
+    if field == 'amount':
+        return "Transaction amount must be a number."
+    return f"Invalid {field}: {error['msg']}."
+
+class DatabaseBusy(Exception):
+    """Every pooled connection stayed checked out for DB_POOL_TIMEOUT."""
+
+def _open_db_connection():
+    conn = sqlite3.connect(DATABASE_PATH, cached_statements=DB_CACHED_STATEMENTS, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+def _acquire_db_connection():
+    """Takes an idle pooled connection, opening a new one while the pool is below DB_POOL_SIZE."""
+    global _db_pool_opened
+    try:
+        return _db_pool.get_nowait()
+    except queue.Empty:
+        pass
+    with _db_pool_lock:
+        opening = _db_pool_opened < DB_POOL_SIZE
+        if opening:
+            _db_pool_opened += 1
+    if opening:
+        try:
+            return _open_db_connection()
+        except Exception:
+            with _db_pool_lock:
+                _db_pool_opened -= 1
+            raise
+    try:
+        return _db_pool.get(timeout=DB_POOL_TIMEOUT)
+    except queue.Empty:
+        raise DatabaseBusy() from None
 
 def get_db_connection():
-   
-    conn = sqlite3.connect('vmb_gateway.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Returns the connection checked out for this request; it goes back to the pool at teardown."""
+    if 'db' not in g:
+        g.db = _acquire_db_connection()
+    return g.db
+
+@app.errorhandler(DatabaseBusy)
+def database_busy(e):
+    return jsonify({"status": "error", "message": "Payment gateway is busy. Please retry shortly."}), 503
+
+@app.teardown_appcontext
+def release_db_connection(exception):
+    conn = g.pop('db', None)
+    if conn is not None:
+        if conn.in_transaction:
+            conn.rollback()
+        _db_pool.put(conn)
+
+
+# --- ASYNC TRANSACTION LOG ---
+# Balance updates stay synchronous; the transaction log rows are queued and
+# written in batches so many requests share one commit (and one fsync).
+
+TXN_LOG_FLUSH_INTERVAL = 0.05  # Seconds to let a batch accumulate before writing
+TXN_LOG_RETRY_DELAY = 0.1  # First backoff after a transient write failure; doubles per retry
+TXN_LOG_MAX_RETRY_DELAY = 5.0
+
+_txn_log_queue = queue.Queue()
+_TXN_LOG_STOP = object()  # Queued at exit; the writer flushes what it holds and returns
+
+def _drain_txn_log_queue(batch):
+    """Moves queued rows into batch; returns True once the stop sentinel is reached."""
+    while True:
+        try:
+            row = _txn_log_queue.get_nowait()
+        except queue.Empty:
+            return False
+        if row is _TXN_LOG_STOP:
+            return True
+        batch.append(row)
+
+def _with_backoff(action, description):
+    """Runs action until it stops raising sqlite3.OperationalError (locked, busy, I/O), backing off between tries."""
+    delay = TXN_LOG_RETRY_DELAY
+    while True:
+        try:
+            return action()
+        except sqlite3.OperationalError as e:
+            print(f"{description} failed, retrying in {delay:.1f}s. Error: {e}")
+            time.sleep(delay)
+            delay = min(delay * 2, TXN_LOG_MAX_RETRY_DELAY)
+
+def _write_txn_log(conn, batch):
+    """Writes batch, removing rows as they are committed.
+
+    OperationalError is transient and propagates so the caller can retry the
+    rows still in batch. Any other sqlite3.Error will never succeed, so only
+    the row that raises it is dropped.
+    """
+    try:
+        conn.executemany(_SQL_INSERT_TXN, batch)
+        conn.commit()
+        batch.clear()
+        return
+    except sqlite3.OperationalError:
+        conn.rollback()
+        raise
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Transaction log batch write failed, retrying {len(batch)} rows individually. Error: {e}")
+
+    while batch:
+        try:
+            conn.execute(_SQL_INSERT_TXN, batch[0])
+            conn.commit()
+        except sqlite3.OperationalError:
+            conn.rollback()
+            raise
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Transaction log row dropped: {batch[0]}. Error: {e}")
+        del batch[0]
+
+def _txn_log_writer():
+    # The writer keeps one dedicated connection; opening it is retried like a write.
+    conn = _with_backoff(_open_db_connection, "Opening the transaction log connection")
+    stopping = False
+    while not stopping:
+        batch = []
+        row = _txn_log_queue.get()
+        if row is _TXN_LOG_STOP:
+            stopping = True
+        else:
+            batch.append(row)
+            time.sleep(TXN_LOG_FLUSH_INTERVAL)
+        stopping = _drain_txn_log_queue(batch) or stopping
+        if batch:
+            _with_backoff(lambda: _write_txn_log(conn, batch), f"Writing {len(batch)} transaction log rows")
+
+_txn_log_thread = None
+
+def _stop_txn_log():
+    """Lets the writer finish every queued and in-hand row before the interpreter exits."""
+    if _txn_log_thread is not None and _txn_log_thread.is_alive():
+        _txn_log_queue.put(_TXN_LOG_STOP)
+        _txn_log_thread.join()
+
+
+# --- STARTUP ---
+# Nothing below runs at import: spawned scoring workers re-import this module
+# as __mp_main__ and must not start writers, load the model or open pools.
+
+_services_lock = threading.Lock()
+_services_started = False
+
+def start_services():
+    """Starts the transaction log writer, loads the model and starts the scoring pool, once per process."""
+    global _txn_log_thread, _services_started
+    if _services_started:
+        return
+    with _services_lock:
+        if _services_started:
+            return
+        _txn_log_thread = threading.Thread(target=_txn_log_writer, name='txn-log-writer', daemon=True)
+        _txn_log_thread.start()
+        atexit.register(_stop_txn_log)
 
+        try:
+            initialize_or_load_model()
+            start_scoring_pool(SCORING_WORKERS)
+        except Exception as e:
+            print(f"FATAL: Could not initialize ML model. Check dependencies and fraud_model.py. Error: {e}")
+        _services_started = True
 
-try:
-    initialize_or_load_model()
-except Exception as e:
-    print(f"FATAL: Could not initialize ML model. Check dependencies and fraud_model.py. Error: {e}")
+@app.before_request
+def _ensure_services_started():
+    # Covers servers that import the app instead of running it as __main__.
+    start_services()
 
 
 
@@ -32,60 +247,40 @@ def user_portal():
 
 @app.route('/api/process_payment', methods=['POST'])
 def process_payment():
-    data = request.json
-
-    required_fields = ['account_number', 'amount', 'security_pin', 'payment_method']
-    if not all(field in data for field in required_fields):
-        return jsonify({"status": "error", "message": "Missing required transaction data."}), 400
-
-    account_number = data['account_number']
-    
-
     try:
-        amount = float(data['amount'])
-    except ValueError:
-        return jsonify({"status": "error", "message": "Transaction amount must be a number."}), 400
+        payload = PaymentIn.model_validate(request.get_json(silent=True))
+    except ValidationError as e:
+        return jsonify({"status": "error", "message": _validation_message(e.errors()[0])}), 400
+
+    account_number = payload.account_number
+    amount = payload.amount
 
     try:
-        risk_score = get_risk_score(data)
+        risk_score = get_risk_score(payload.model_dump())
     except Exception as e:
 
         print(f"ML Model Error during scoring: {e}")
         return jsonify({"status": "error", "message": "Internal ML processing error. Cannot assess risk."}), 500
 
-    transaction_status = "Approved"
+    risk_level = (risk_score >= RISK_THRESHOLD_FLAG) + (risk_score >= RISK_THRESHOLD_DENY)
+    transaction_status = _RISK_STATUS[risk_level]
     rejection_reason = None
     
-    if risk_score >= RISK_THRESHOLD_DENY:
-        transaction_status = "Denied"
+    if risk_level == 2:
         rejection_reason = "High Fraud Risk Detected (Score: {:.2f})".format(risk_score)
-    elif risk_score >= RISK_THRESHOLD_FLAG:
-        transaction_status = "Flagged"
+    elif risk_level == 1:
         print(f"TRANSACTION FLAGGED: Risk {risk_score:.4f}. Requires Banker Review.")
 
 
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    account = cursor.execute('SELECT current_balance FROM accounts WHERE account_number = ?', 
-                             (account_number,)).fetchone()
-    
     current_balance = 0.0 
     db_debit_required = False
 
-  
-    if account is None and account_number != SIMULATION_ACCOUNT:
-        try:
-            cursor.execute('''INSERT INTO accounts (account_number, current_balance, customer_name) 
-                              VALUES (?, ?, ?)''', (account_number, 1000.00, 'Simulated User'))
-            conn.commit()
-            current_balance = 1000.00
-            print(f"New simulated account created: {account_number}")
-        except sqlite3.IntegrityError:
-
-            pass 
-    elif account is not None:
-        current_balance = account['current_balance']
+    if account_number != SIMULATION_ACCOUNT:
+        current_balance = cursor.execute(_SQL_UPSERT_ACCOUNT, 
+                                         (account_number, 1000.00, 'Simulated User')).fetchone()[0]
 
 
     if account_number == SIMULATION_ACCOUNT:
@@ -104,21 +299,16 @@ def process_payment():
         if db_debit_required and transaction_status == "Approved":
 
             new_balance = current_balance - amount
-            cursor.execute('UPDATE accounts SET current_balance = ? WHERE account_number = ?', 
-                           (new_balance, account_number))
+            cursor.execute(_SQL_UPDATE_BAL, (new_balance, account_number))
             print(f"Account {account_number} debited. New balance: {new_balance:.2f}")
         
-        transaction_id = str(uuid.uuid4())
+        transaction_id = uuid.uuid4().hex
         
 
         is_fraud_label = 1 if risk_score > 0.9 else 0 # Simple label for demonstration
-        cursor.execute('''INSERT INTO transactions 
-                          (account_number, amount, payment_method, timestamp, status, risk_score, is_fraud) 
-                          VALUES (?, ?, ?, ?, ?, ?, ?)''', 
-                       (account_number, amount, data['payment_method'], datetime.datetime.now().isoformat(), 
-                        transaction_status, risk_score, is_fraud_label))
         conn.commit()
-        conn.close()
+        _txn_log_queue.put((account_number, amount, payload.payment_method, int(time.time() * 1000), 
+                            transaction_status, risk_score, is_fraud_label))
         
         return jsonify({
             "status": transaction_status,
@@ -128,7 +318,7 @@ def process_payment():
         }), 200
 
 
-    conn.close()
+    conn.commit()
     return jsonify({
         "status": "denied",
         "risk_score": risk_score,
@@ -137,6 +327,11 @@ def process_payment():
 
 # --- BANKER PORTAL ENDPOINTS ---
 
+@app.template_filter('ts_date')
+def ts_date(ts_ms):
+    """Formats an epoch-millisecond timestamp as an ISO date for display."""
+    return datetime.datetime.fromtimestamp(ts_ms / 1000).date().isoformat()
+
 @app.route('/banker_login')
 def banker_login():
   
@@ -144,22 +339,47 @@ def banker_login():
 
 @app.route('/banker_portal')
 def banker_portal():
+    # Flagged transactions and accounts page independently of each other.
+    flagged_page = min(max(request.args.get('flagged_page', 1, type=int), 1), PORTAL_MAX_PAGE)
+    accounts_page = min(max(request.args.get('accounts_page', 1, type=int), 1), PORTAL_MAX_PAGE)
+    page_size = min(max(request.args.get('page_size', PORTAL_PAGE_SIZE, type=int), 1), PORTAL_MAX_PAGE_SIZE)
+
     conn = get_db_connection()
 
-    flagged_txns = conn.execute('''SELECT * FROM transactions 
-                                   WHERE status = 'Flagged' ORDER BY risk_score DESC''').fetchall()
-                                   
-    high_risk_txns = conn.execute('''SELECT * FROM transactions 
-                                     ORDER BY risk_score DESC LIMIT 10''').fetchall()
+    # Top-10 and the current page of flagged transactions come back in one round trip,
+    # each side an index range scan; one extra flagged row is fetched to detect a next page.
+    # Equal scores fall back to the integer ts_ms, newest first, so paging is stable.
+    columns = ', '.join(TXN_COLUMNS)
+    txns = conn.execute(f'''SELECT * FROM (SELECT {columns}, 1 AS is_top FROM transactions
+                                           ORDER BY risk_score DESC, ts_ms DESC LIMIT 10)
+                            UNION ALL
+                            SELECT * FROM (SELECT {columns}, 0 AS is_top FROM transactions
+                                           WHERE status = 'Flagged'
+                                           ORDER BY risk_score DESC, ts_ms DESC LIMIT ? OFFSET ?)
+                            ORDER BY is_top DESC, risk_score DESC, ts_ms DESC''',
+                        (page_size + 1, (flagged_page - 1) * page_size)).fetchall()
+
+    high_risk_txns = [txn for txn in txns if txn[_TXN_IS_TOP]]
+    flagged_txns = [txn for txn in txns if not txn[_TXN_IS_TOP]]
                                      
-    accounts = conn.execute('SELECT * FROM accounts').fetchall()
-
-    conn.close()
-    
-    response = make_response(render_template('banker_portal.html', 
-                                             flagged_txns=flagged_txns, 
-                                             high_risk_txns=high_risk_txns,
-                                             accounts=accounts))
+    accounts = conn.execute(f'''SELECT {', '.join(ACCOUNT_COLUMNS)} FROM accounts
+                                ORDER BY id LIMIT ? OFFSET ?''',
+                            (page_size + 1, (accounts_page - 1) * page_size)).fetchall()
+
+    # Every row is fetched, so hand the connection back instead of holding it while the client reads.
+    release_db_connection(None)
+
+    response = Response(stream_template('banker_portal.html',
+                                        flagged_txns=flagged_txns[:page_size],
+                                        high_risk_txns=high_risk_txns,
+                                        accounts=accounts[:page_size],
+                                        flagged_page=flagged_page,
+                                        flagged_has_next=len(flagged_txns) > page_size,
+                                        accounts_page=accounts_page,
+                                        accounts_has_next=len(accounts) > page_size,
+                                        page_size=page_size,
+                                        TXN=TXN,
+                                        ACCOUNT=ACCOUNT))
     
     response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
     response.headers['Pragma'] = 'no-cache'
@@ -168,4 +388,5 @@ def banker_portal():
     return response
 
 if __name__ == '__main__':
+    start_services()
     app.run(debug=True, port=5000)
@@ -1,13 +1,35 @@
 import sqlite3
 
+def migrate_timestamps(cursor):
+    """Converts a pre-existing ISO `timestamp` column to integer epoch-ms `ts_ms`."""
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(transactions)')]
+    if 'timestamp' not in columns:
+        return
+
+    cursor.execute('BEGIN')
+    cursor.execute('ALTER TABLE transactions ADD COLUMN ts_ms INTEGER')
+    # Old timestamps came from naive datetime.now(), i.e. local time; 'utc' converts them to UTC.
+    cursor.execute('''UPDATE transactions
+                      SET ts_ms = CAST(ROUND((julianday(timestamp, 'utc') - 2440587.5) * 86400000) AS INTEGER)''')
+    unparsed = cursor.execute('SELECT COUNT(*) FROM transactions WHERE ts_ms IS NULL').fetchone()[0]
+    if unparsed:
+        cursor.execute('ROLLBACK')
+        raise ValueError(f"{unparsed} transactions have an unparseable timestamp; migration aborted.")
+    cursor.execute('ALTER TABLE transactions DROP COLUMN timestamp')
+    cursor.execute('COMMIT')
+    print("Migrated transactions.timestamp to epoch-ms ts_ms.")
+
 def init_db():
     conn = sqlite3.connect('vmb_gateway.db')
     cursor = conn.cursor()
+    migrate_timestamps(cursor)
 
     with open('schema.sql', 'r') as f:
         sql_script = f.read()
 
     cursor.executescript(sql_script)
+    # Gather index statistics so the planner uses them for the portal queries.
+    cursor.execute('ANALYZE')
     conn.commit()
     conn.close()
     print("Database 'vmb_gateway.db' created and initialized with sample data.")
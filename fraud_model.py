@@ -4,22 +4,73 @@ from sklearn.model_selection import train_test_split
 from xgboost import XGBClassifier
 from joblib import dump, load
 import os
-import random
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import zlib
+from functools import lru_cache
+
+try:
+    from numba import njit
+except ImportError:  # Numba is optional; fall back to the plain Python kernel.
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+try:
+    import treelite
+    import tl2cgen
+except ImportError:  # Compiled tree inference is optional; the Booster is used instead.
+    treelite = tl2cgen = None
+
+try:
+    import onnxruntime
+    from onnxmltools import convert_xgboost
+    from onnxmltools.convert.common.data_types import FloatTensorType
+except ImportError:  # ONNX Runtime inference is optional as well.
+    onnxruntime = None
 
 MODEL_PATH = 'fraud_xgb_model.joblib'
+ONNX_MODEL_PATH = 'fraud_xgb_model.onnx'
+TREE_LIB_PATH = 'fraud_xgb_model.so'
 
-def feature_engineer(data):
-    """Converts raw transaction data into numerical features for the model."""
-    
-    method_map = {'vmb_transfer': 1, 'card_payment': 2, 'crypto': 3, 'digital_wallet': 4}
-    
-    features = [
-        float(data['account_number'][:4]), 
-        float(data['amount']),            
-        float(method_map.get(data['payment_method'], 0)), 
-        random.uniform(0.1, 0.9)         
-    ]
-    return features
+N_FEATURES = 4
+SCORE_CACHE_SIZE = 4096
+SCORING_TIMEOUT = 5.0  # Seconds to wait for a warm scoring worker before scoring in-process
+_WARMUP_FEATURES = (1000.0, 100.0, 1.0, 0.5)  # Any valid row; scoring it loads the model and runs the JIT
+
+_PREDICT = None
+_SCORING_POOL = None
+_SCORING_POOL_WORKERS = 0
+_SCORING_POOL_LOCK = threading.Lock()
+_MODEL_LOCK = threading.Lock()
+_TL = threading.local()
+
+_METHOD_MAP = {'vmb_transfer': 1.0, 'card_payment': 2.0, 'crypto': 3.0, 'digital_wallet': 4.0}
+_method_id = _METHOD_MAP.get  # Bound once; unknown methods map to 0.0
+
+def _feature_buffer():
+    """Returns this thread's reusable (1, N_FEATURES) float32 input row."""
+    buf = getattr(_TL, 'buf', None)
+    if buf is None:
+        buf = _TL.buf = np.empty((1, N_FEATURES), dtype=np.float32)
+    return buf
+
+def _device_risk(account_number):
+    """Simulated device risk in [0.1, 0.9], derived deterministically from the account."""
+    return ((zlib.crc32(account_number.encode()) & 0xFF) / 255.0) * 0.8 + 0.1
+
+@njit(cache=True)
+def _fill_features(out, account_prefix, amount, method_id, device_risk):
+    out[0, 0] = account_prefix
+    out[0, 1] = amount
+    out[0, 2] = method_id
+    out[0, 3] = device_risk
+
+def _transaction_features(account_number, amount, payment_method):
+    """Converts raw transaction fields into the N_FEATURES numerical model inputs."""
+    return (float(account_number[:4]), amount,
+            _method_id(payment_method, 0.0), _device_risk(account_number))
 
 def train_model(df):
     """Simulates training the fraud detection model."""
@@ -42,29 +93,172 @@ def train_model(df):
 def initialize_or_load_model():
     """Initializes the model, creating dummy data if it doesn't exist."""
     if os.path.exists(MODEL_PATH):
-        return load(MODEL_PATH)
+        return _cache_model(load(MODEL_PATH))
     
     print("ML Model file not found. Generating dummy training data...")
 
+    rng = np.random.Generator(np.random.PCG64())
+    n_samples = 1000
     data = {
-        'account_prefix': [float(random.randint(1000, 9999)) for _ in range(1000)],
-        'amount': [random.uniform(10.0, 5000.0) for _ in range(1000)],
-        'method_id': [float(random.randint(1, 4)) for _ in range(1000)],
-        'device_risk': [random.uniform(0.1, 0.9) for _ in range(1000)],
-        'is_fraud': [1 if random.random() < 0.05 else 0 for _ in range(1000)]
+        'account_prefix': rng.integers(1000, 9999, size=n_samples, endpoint=True).astype(np.float64),
+        'amount': rng.uniform(10.0, 5000.0, size=n_samples),
+        'method_id': rng.integers(1, 4, size=n_samples, endpoint=True).astype(np.float64),
+        'device_risk': rng.uniform(0.1, 0.9, size=n_samples),
+        'is_fraud': (rng.random(n_samples) < 0.05).astype(np.int64)
     }
     df = pd.DataFrame(data)
     
-    return train_model(df)
+    return _cache_model(train_model(df))
 
-def get_risk_score(transaction_data):
-    """Predicts fraud risk using the loaded ML model."""
-    model = initialize_or_load_model()
-    
-    features_list = feature_engineer(transaction_data)
+def _is_stale(path):
+    """True if a derived model artifact is missing or older than the joblib model."""
+    return not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(MODEL_PATH)
+
+def _onnx_predictor(model):
+    """Exports the model to ONNX and returns an ONNX Runtime scoring function."""
+    if onnxruntime is None:
+        return None
+    try:
+        if _is_stale(ONNX_MODEL_PATH):
+            onnx_model = convert_xgboost(model, initial_types=[('input', FloatTensorType([None, N_FEATURES]))])
+            with open(ONNX_MODEL_PATH, 'wb') as f:
+                f.write(onnx_model.SerializeToString())
+        session = onnxruntime.InferenceSession(ONNX_MODEL_PATH, providers=['CPUExecutionProvider'])
+        probabilities = session.get_outputs()[1].name  # Outputs are (label, probabilities)
+        return lambda buf: session.run([probabilities], {'input': buf})[0][0, 1]
+    except Exception as e:
+        print(f"ONNX Runtime predictor unavailable. Error: {e}")
+        return None
+
+def _treelite_predictor(booster):
+    """Compiles the trees to a shared library with treelite and returns its scoring function."""
+    if tl2cgen is None:
+        return None
+    try:
+        if _is_stale(TREE_LIB_PATH):
+            tl_model = treelite.frontend.from_xgboost(booster)
+            tl2cgen.export_lib(tl_model, toolchain='gcc', libpath=TREE_LIB_PATH, params={'parallel_comp': 4})
+        predictor = tl2cgen.Predictor(TREE_LIB_PATH, nthread=1)
+        return lambda buf: predictor.predict(tl2cgen.DMatrix(buf)).ravel()[0]
+    except Exception as e:
+        print(f"Compiled tree predictor unavailable. Error: {e}")
+        return None
+
+def _cache_model(model):
+    """Stores the fastest available scoring function for reuse across requests."""
+    global _PREDICT
+    booster = model.get_booster()
+    # Every backend returns the binary:logistic positive-class probability for a (1, N_FEATURES) row.
+    _PREDICT = (_onnx_predictor(model)
+                or _treelite_predictor(booster)
+                or (lambda buf: booster.inplace_predict(buf)[0]))
+    _cached_risk_score.cache_clear()
+    return model
+
+def _get_predict():
+    """Returns the cached scoring function, loading the model once on first use."""
+    if _PREDICT is None:
+        with _MODEL_LOCK:
+            if _PREDICT is None:
+                initialize_or_load_model()
+    return _PREDICT
+
+def _init_scoring_worker():
+    """Loads the model once in each scoring worker process."""
+    initialize_or_load_model()
+
+def _publish_when_warm(pool, warmups):
+    """Routes scoring to pool once every warm-up task has finished; until then scoring stays in-process."""
+    global _SCORING_POOL
+    try:
+        for future in warmups:
+            future.result()  # No request timeout: worker start-up, model load and first JIT take a while
+    except Exception as e:
+        print(f"Scoring pool failed to warm up; scoring in-process. Error: {e}")
+        _terminate_workers(pool)
+        return
+    with _SCORING_POOL_LOCK:
+        _SCORING_POOL = pool
+
+def start_scoring_pool(max_workers, wait=True):
+    """Moves model scoring into a pool of worker processes, each holding its own warmed model.
+
+    Workers only start on submit, so one warm-up task per worker is queued
+    here. With wait=False the warm-up finishes on a background thread.
+    """
+    global _SCORING_POOL_WORKERS
+    _SCORING_POOL_WORKERS = max_workers
+    # spawn rather than fork: the web process already runs threads by the time workers start.
+    pool = ProcessPoolExecutor(max_workers=max_workers,
+                               mp_context=multiprocessing.get_context('spawn'),
+                               initializer=_init_scoring_worker)
+    warmups = [pool.submit(score_features, _WARMUP_FEATURES) for _ in range(max_workers)]
+    if wait:
+        _publish_when_warm(pool, warmups)
+    else:
+        threading.Thread(target=_publish_when_warm, args=(pool, warmups),
+                         name='scoring-pool-warmup', daemon=True).start()
+    return pool
+
+def _terminate_workers(pool):
+    """Shuts pool down, killing workers so a hung one does not linger."""
+    if hasattr(pool, 'terminate_workers'):  # Python 3.14+; also shuts the executor down
+        pool.terminate_workers()
+        return
+    # shutdown() drops the executor's process table, so take it first.
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+def _replace_pool(failed_pool, reason):
+    """Swaps in a fresh pool after a worker died or hung, unless another thread already has."""
+    global _SCORING_POOL
+    with _SCORING_POOL_LOCK:
+        if _SCORING_POOL is not failed_pool:
+            return
+        print(f"Scoring worker {reason}; restarting the scoring pool.")
+        _SCORING_POOL = None
+    _terminate_workers(failed_pool)
+    start_scoring_pool(_SCORING_POOL_WORKERS, wait=False)
+
+def _score_in_pool(pool, features):
+    # The web process holds its own loaded model, so a failed pool never fails the request.
+    try:
+        return pool.submit(score_features, features).result(timeout=SCORING_TIMEOUT)
+    except BrokenProcessPool:
+        _replace_pool(pool, 'died')
+    except FutureTimeoutError:
+        _replace_pool(pool, 'timed out')
+    return score_features(features)
+
+def score_features(features):
+    """Scores one tuple of N_FEATURES model inputs in the current process."""
+    predict = _get_predict()
     
-    input_data = np.array([features_list], dtype=np.float32)
+    # String parsing already happened in the caller; the numeric writes run in the JIT kernel.
+    input_data = _feature_buffer()
+    _fill_features(input_data, *features)
 
-    risk_score = model.predict_proba(input_data)[:, 1][0]
+    risk_score = predict(input_data)
     
     return float(risk_score)
+
+@lru_cache(maxsize=SCORE_CACHE_SIZE)
+def _cached_risk_score(account_number, amount, payment_method):
+    # Only the four feature floats are pickled to a worker, not the request data.
+    features = _transaction_features(account_number, amount, payment_method)
+    pool = _SCORING_POOL
+    if pool is not None:
+        return _score_in_pool(pool, features)
+    return score_features(features)
+
+def get_risk_score(transaction_data):
+    """Predicts fraud risk using the loaded ML model.
+
+    Features are deterministic, so repeat (account, amount, method) submissions
+    are answered from an in-memory LRU cache without re-scoring.
+    """
+    return _cached_risk_score(transaction_data['account_number'],
+                              round(float(transaction_data['amount']), 2),
+                              transaction_data['payment_method'])
@@ -12,13 +12,19 @@ CREATE TABLE IF NOT EXISTS transactions (
     account_number TEXT NOT NULL,
     amount REAL NOT NULL,
     payment_method TEXT NOT NULL,
-    timestamp TEXT NOT NULL,
+    ts_ms INTEGER NOT NULL, -- epoch milliseconds
     status TEXT NOT NULL, -- 'Approved', 'Denied', 'Flagged'
     risk_score REAL NOT NULL,
     is_fraud INTEGER NOT NULL DEFAULT 0, -- 0 for legitimate, 1 for actual fraud (used for model training)
     FOREIGN KEY(account_number) REFERENCES accounts(account_number)
 );
 
+-- Serves the banker portal's ORDER BY risk_score DESC, ts_ms DESC scans
+CREATE INDEX IF NOT EXISTS idx_txn_risk ON transactions(risk_score DESC, ts_ms DESC);
+
+-- Serves the banker portal's WHERE status = 'Flagged' ORDER BY risk_score DESC, ts_ms DESC lookup
+CREATE INDEX IF NOT EXISTS idx_txn_status_risk ON transactions(status, risk_score DESC, ts_ms DESC);
+
 -- Banker Portal Data (optional, for demo)
-INSERT INTO accounts (account_number, current_balance, customer_name) VALUES ('1234567890123456', 5000.00, 'Alice Johnson');
-INSERT INTO accounts (account_number, current_balance, customer_name) VALUES ('9876543210987654', 150.50, 'Bob Smith');
\ No newline at end of file
+INSERT OR IGNORE INTO accounts (account_number, current_balance, customer_name) VALUES ('1234567890123456', 5000.00, 'Alice Johnson');
+INSERT OR IGNORE INTO accounts (account_number, current_balance, customer_name) VALUES ('9876543210987654', 150.50, 'Bob Smith');
\ No newline at end of file